@@ -1,13 +1,106 @@
 from aocd import data
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from functools import reduce
+import os
+import time
+import numpy as np
 
 class monkey:
+    __slots__ = (
+        'monkey_number', 'item_queue', 'operation', 'operate', 'test_tuple', 'divisor', 'true_monkey', 'false_monkey'
+    )
+
     def __init__(self, monkey_number, starting_items, operation, test_tuple=None):
         self.monkey_number = monkey_number
-        self.starting_items = starting_items
+        self.item_queue = deque(starting_items) #items are inspected from the left and caught on the right
         self.operation = operation
+        self.operate = compile_operation(operation)
         self.test_tuple = test_tuple
-        self.test = lambda value: test_tuple[1] if value % test_tuple[0]==0 else test_tuple[2]
+        self.divisor, self.true_monkey, self.false_monkey = test_tuple if test_tuple else (None, None, None)
+
+    @property
+    def starting_items(self):
+        return list(self.item_queue)
+
+    @starting_items.setter
+    def starting_items(self, item_ls):
+        self.item_queue = deque(item_ls)
+
+    def test(self, value):
+        return self.true_monkey if value % self.divisor==0 else self.false_monkey
+
+
+def compile_operation(operation):
+    """
+    turns an operation string into a function of old, so the expression is only parsed once
+    :param operation: right hand side of the operation, e.g. "old * 19"
+    :return: function taking the old worry level and returning the new one
+
+    >>> compile_operation("old * old")(7)
+    49
+    >>> compile_operation("old + 6")(7)
+    13
+    >>> compile_operation("old * 19")(7)
+    133
+    >>> compile_operation("(old + 1) * 2")(7)
+    16
+    """
+    operation_ls = operation.split(' ')
+    if len(operation_ls) == 3 and operation_ls[0] == 'old':
+        operator, operand = operation_ls[1], operation_ls[2]
+        if operand == 'old':
+            if operator == '*':
+                return lambda old: old * old
+            elif operator == '+':
+                return lambda old: old + old
+        elif operand.isdigit():
+            constant = int(operand)
+            if operator == '*':
+                return lambda old: old * constant
+            elif operator == '+':
+                return lambda old: old + constant
+    # anything else is compiled once into a function
+    return eval(compile(f"lambda old: {operation}", '<operation>', 'eval'), {})
+
+
+class RoundObserver:
+    def __init__(self, sample_every=100):
+        """
+        collects timings and queue statistics from every sample_every-th round of calculate_monkey_business
+        :param sample_every: how often to sample a round, rounds in between run uninstrumented
+        """
+        self.sample_every = sample_every
+        self.round_record_ls = []
+        self.phase_time_dict = {"operation": 0.0, "test": 0.0, "throw": 0.0}
+
+    def record_phase(self, phase, elapsed_time):
+        self.phase_time_dict[phase] += elapsed_time
+
+    def record_round(self, round_num, elapsed_time, inspection_delta_ls, queue_length_ls):
+        self.round_record_ls.append({
+            "round": round_num,
+            "time": elapsed_time,
+            "inspections": inspection_delta_ls,
+            "queue_lengths": queue_length_ls,
+        })
+
+    def summary(self):
+        """
+        :return: dictionary of the sampled round count, total and mean round time, and time spent in each phase
+        """
+        total_time = sum(x["time"] for x in self.round_record_ls)
+        phase_total_time = sum(self.phase_time_dict.values())
+        return {
+            "sampled_rounds": len(self.round_record_ls),
+            "total_time": total_time,
+            "mean_round_time": total_time/len(self.round_record_ls) if self.round_record_ls else 0.0,
+            "phase_time": dict(self.phase_time_dict),
+            "phase_share": {
+                phase: (phase_time/phase_total_time if phase_total_time else 0.0)
+                for phase, phase_time in self.phase_time_dict.items()
+            },
+        }
 
 
 def make_monkey(unformatted_data):
@@ -23,50 +116,138 @@ def make_monkey(unformatted_data):
     operation = unformatted_data_ls[2].split('= ')[1]
     test_tuple = (
         int(unformatted_data_ls[3].split(' ')[-1]),
-        int(unformatted_data_ls[4][-1]),
-        int(unformatted_data_ls[5][-1])
+        int(unformatted_data_ls[4].split(' ')[-1]),
+        int(unformatted_data_ls[5].split(' ')[-1])
     )
     new_monkey = monkey(monkey_number, starting_items, operation, test_tuple)
     return new_monkey
 
-def monkey_turn(monkey_index,monkey_ls,test_product):
+def monkey_turn(monkey_index,monkey_ls,relief_modulus=None,relief_divisor=None):
     """
     describes a single monkey's turn
-    :param test_product: product of all monkey test values
+    :param relief_modulus: worry levels are reduced modulo relief_modulus after each inspection, None to not reduce
+    :param relief_divisor: worry levels are divided by relief_divisor (rounded down) before the reduction.
+    defaults to 3 (part 1) when there is no relief_modulus and 1 (part 2) otherwise
     :param monkey_index: index of monkey that is inspecting and throwing
     :param monkey_ls: list of all monkey objects
     :return: updated monkey_ls
     """
+    if relief_divisor is None:
+        relief_divisor = 3 if relief_modulus is None else 1
     curr_monkey = monkey_ls[monkey_index]
-    for curr_item in curr_monkey.starting_items:
-        old = curr_item
-        inspection_worry_level = eval(curr_monkey.operation)%test_product
-        recipient_monkey = curr_monkey.test(inspection_worry_level)
-        monkey_ls[recipient_monkey].starting_items.append(inspection_worry_level)
-    curr_monkey.starting_items = []
+    item_queue = curr_monkey.item_queue
+    operate = curr_monkey.operate
+    divisor = curr_monkey.divisor
+    true_queue = monkey_ls[curr_monkey.true_monkey].item_queue
+    false_queue = monkey_ls[curr_monkey.false_monkey].item_queue
+    for loop_index in range(len(item_queue)):
+        inspection_worry_level = operate(item_queue.popleft())//relief_divisor
+        if relief_modulus:
+            inspection_worry_level %= relief_modulus
+        if inspection_worry_level % divisor==0:
+            true_queue.append(inspection_worry_level)
+        else:
+            false_queue.append(inspection_worry_level)
     return monkey_ls
 
-def round_implementer(monkey_ls, item_count_ls,test_product):
+def round_implementer(monkey_ls, item_count_ls,relief_modulus=None,relief_divisor=None):
     """
     describes a round of monkey shenanigans
     :param item_count_ls: list of number of objects each monkey has examined
-    :param test_product: product of all monkey test values
+    :param relief_modulus: worry levels are reduced modulo relief_modulus, see monkey_turn
+    :param relief_divisor: worry levels are divided by relief_divisor, see monkey_turn
     :param monkey_ls: list of monkey objects
     :return: updated monkey list
     """
     for curr_index in range(len(monkey_ls)):
-        item_count_ls[curr_index]+=len(monkey_ls[curr_index].starting_items)
-        monkey_ls = monkey_turn(curr_index,monkey_ls,test_product)
+        item_count_ls[curr_index]+=len(monkey_ls[curr_index].item_queue)
+        monkey_ls = monkey_turn(curr_index,monkey_ls,relief_modulus,relief_divisor)
     return monkey_ls, item_count_ls
 
-def calculate_monkey_business(raw_input, num_rounds):
+def observed_monkey_turn(monkey_index, monkey_ls, relief_modulus, relief_divisor, observer):
     """
-    calculates the level of monkey business over num_rounds of shenanigans
-    :param raw_input: raw data
-    :param num_rounds: number of rounds to implement
-    :return: total amount of monkey business
+    same as monkey_turn, but each phase is done for all items at once so it can be timed
+    :param observer: RoundObserver receiving the operation, test and throw timings
+    :return: updated monkey_ls
     """
+    curr_monkey = monkey_ls[monkey_index]
+    item_queue = curr_monkey.item_queue
+    operate = curr_monkey.operate
+    divisor = curr_monkey.divisor
+
+    start_time = time.perf_counter()
+    worry_level_ls = [operate(curr_item)//relief_divisor for curr_item in item_queue]
+    if relief_modulus:
+        worry_level_ls = [x % relief_modulus for x in worry_level_ls]
+    item_queue.clear()
+    operation_time = time.perf_counter()
+    is_divisible_ls = [x % divisor==0 for x in worry_level_ls]
+    test_time = time.perf_counter()
+    true_queue = monkey_ls[curr_monkey.true_monkey].item_queue
+    false_queue = monkey_ls[curr_monkey.false_monkey].item_queue
+    for inspection_worry_level, is_divisible in zip(worry_level_ls, is_divisible_ls):
+        if is_divisible:
+            true_queue.append(inspection_worry_level)
+        else:
+            false_queue.append(inspection_worry_level)
+    throw_time = time.perf_counter()
 
+    observer.record_phase("operation", operation_time - start_time)
+    observer.record_phase("test", test_time - operation_time)
+    observer.record_phase("throw", throw_time - test_time)
+    return monkey_ls
+
+def observed_round_implementer(monkey_ls, item_count_ls, relief_modulus, relief_divisor, observer, round_num):
+    """
+    same as round_implementer, but reports the round to observer
+    :param observer: RoundObserver receiving the round timing, inspection counts and queue lengths
+    :param round_num: number of the current round
+    :return: updated monkey list, item_count_ls
+    """
+    start_time = time.perf_counter()
+    inspection_delta_ls = []
+    for curr_index in range(len(monkey_ls)):
+        inspection_delta_ls.append(len(monkey_ls[curr_index].item_queue))
+        item_count_ls[curr_index]+=inspection_delta_ls[-1]
+        monkey_ls = observed_monkey_turn(curr_index,monkey_ls,relief_modulus,relief_divisor,observer)
+    observer.record_round(
+        round_num,
+        time.perf_counter() - start_time,
+        inspection_delta_ls,
+        [len(curr_monkey.item_queue) for curr_monkey in monkey_ls]
+    )
+    return monkey_ls, item_count_ls
+
+def array_round_implementer(worry_arr, owner_arr, monkey_ls, item_count_ls, relief_modulus, relief_divisor=1):
+    """
+    describes a round of monkey shenanigans with every item held in arrays, each monkey's turn handles all
+    of its items at once
+    :param worry_arr: int64 array of the worry level of every item
+    :param owner_arr: int64 array of the index of the monkey holding every item
+    :param monkey_ls: list of monkey objects
+    :param item_count_ls: list of number of objects each monkey has examined
+    :param relief_modulus: worry levels are reduced modulo relief_modulus, None to not reduce
+    :param relief_divisor: worry levels are divided by relief_divisor (rounded down) before the reduction
+    :return: updated worry_arr, owner_arr and item_count_ls
+    """
+    for monkey_index, curr_monkey in enumerate(monkey_ls):
+        held_item_indices = np.flatnonzero(owner_arr == monkey_index)
+        item_count_ls[monkey_index] += held_item_indices.size
+        if held_item_indices.size:
+            inspection_worry_arr = curr_monkey.operate(worry_arr[held_item_indices])//relief_divisor
+            if relief_modulus:
+                inspection_worry_arr %= relief_modulus
+            worry_arr[held_item_indices] = inspection_worry_arr
+            divisor, true_monkey, false_monkey = curr_monkey.test_tuple
+            owner_arr[held_item_indices] = np.where(inspection_worry_arr % divisor == 0, true_monkey, false_monkey)
+    return worry_arr, owner_arr, item_count_ls
+
+def parse_monkeys(raw_input):
+    """
+    makes the monkey objects from the raw input
+    :param raw_input: raw data
+    :return: list of monkey objects, product of all monkey test values
+    """
     monkey_ls = []
     for unformatted_curr_monkey in raw_input.split('\n\n'):
         new_monkey = make_monkey(unformatted_curr_monkey)
@@ -74,14 +255,191 @@ def calculate_monkey_business(raw_input, num_rounds):
 
     #to simplify calculation, define a test_product (product of all the test values)
     test_product = reduce(lambda x,y: x*y,[curr_monkey.test_tuple[0] for curr_monkey in monkey_ls])
+    return monkey_ls, test_product
 
-    item_count_ls = [0 for x in monkey_ls]
+def safe_relief_modulus(relief_divisor, test_product, num_inspections):
+    """
+    when worry levels are divided after each inspection they can't just be reduced modulo test_product.
+    a worry level reduced modulo relief_divisor**n * test_product still gives the exact test results for the next
+    n inspections though, so reducing by this caps how large worry levels can grow
+    :param relief_divisor: worry levels are divided by relief_divisor after each inspection
+    :param test_product: product of all monkey test values
+    :param num_inspections: most inspections an item can still have, counting the inspections still to come
+    in the current round as well as the later rounds
+    :return: modulus worry levels can safely be reduced by
+
+    >>> safe_relief_modulus(3, 96577, 0)
+    96577
+    >>> safe_relief_modulus(3, 96577, 2)
+    869193
+    """
+    return relief_divisor**num_inspections * test_product
+
+def item_round(monkey_ls, monkey_index, worry_level, test_product):
+    """
+    follows a single item through one round. items thrown to a later monkey are inspected again in the same round
+    :param monkey_ls: list of monkey objects
+    :param monkey_index: index of monkey holding the item at the start of the round
+    :param worry_level: worry level of the item at the start of the round
+    :param test_product: product of all monkey test values
+    :return: monkey index and worry level at the end of the round, tuple of the monkeys that inspected the item
+    """
+    inspector_ls = []
+    while True:
+        curr_monkey = monkey_ls[monkey_index]
+        inspector_ls.append(monkey_index)
+        worry_level = curr_monkey.operate(worry_level)%test_product
+        if worry_level % curr_monkey.divisor==0:
+            recipient_monkey = curr_monkey.true_monkey
+        else:
+            recipient_monkey = curr_monkey.false_monkey
+        if recipient_monkey <= monkey_index: #recipient has already had its turn this round
+            return recipient_monkey, worry_level, tuple(inspector_ls)
+        monkey_index = recipient_monkey
+
+def item_inspection_counts(monkey_ls, monkey_index, worry_level, num_rounds, test_product):
+    """
+    counts how many times each monkey inspects a single item over num_rounds.
+    the (monkey, worry level) state of an item is finite, so once a state repeats the rest of the
+    rounds are worked out from the cycle instead of being simulated
+    :param monkey_ls: list of monkey objects
+    :param monkey_index: index of monkey holding the item at the start
+    :param worry_level: starting worry level of the item
+    :param num_rounds: number of rounds to implement
+    :param test_product: product of all monkey test values
+    :return: list of number of inspections of the item by each monkey
+    """
+    seen_round_dict = {} #state at the start of a round -> round number
+    round_inspector_ls = [] #monkeys that inspected the item in each simulated round
+    curr_state = (monkey_index, worry_level)
     for round_num in range(num_rounds):
-        monkey_ls, item_count_ls = round_implementer(monkey_ls, item_count_ls,test_product )
+        if curr_state in seen_round_dict:
+            cycle_start = seen_round_dict[curr_state]
+            break
+        seen_round_dict[curr_state] = round_num
+        monkey_index, worry_level, inspector_tuple = item_round(monkey_ls, *curr_state, test_product)
+        round_inspector_ls.append(inspector_tuple)
+        curr_state = (monkey_index, worry_level)
+    else: #no repeat within num_rounds, every round was simulated
+        cycle_start = num_rounds
+
+    #rounds before the cycle happen once, the cycle repeats for the rest
+    round_multiplier_ls = [1]*cycle_start
+    if cycle_start < num_rounds:
+        cycle_length = len(round_inspector_ls) - cycle_start
+        num_cycles, leftover_rounds = divmod(num_rounds - cycle_start, cycle_length)
+        round_multiplier_ls += [num_cycles + (x < leftover_rounds) for x in range(cycle_length)]
+
+    item_count_ls = [0 for x in monkey_ls]
+    for inspector_tuple, multiplier in zip(round_inspector_ls, round_multiplier_ls):
+        for inspector_index in inspector_tuple:
+            item_count_ls[inspector_index] += multiplier
+    return item_count_ls
+
+# monkeys shared by every item in a worker process, parsed once by the pool initializer
+_worker_monkey_ls = None
+_worker_test_product = None
+
+def _init_item_worker(raw_input):
+    global _worker_monkey_ls, _worker_test_product
+    _worker_monkey_ls, _worker_test_product = parse_monkeys(raw_input)
+
+def _item_worker_counts(item_tuple):
+    monkey_index, worry_level, num_rounds = item_tuple
+    return item_inspection_counts(_worker_monkey_ls, monkey_index, worry_level, num_rounds, _worker_test_product)
+
+def monkey_business(item_count_ls):
+    """
+    :param item_count_ls: list of number of objects each monkey has examined
+    :return: product of the two highest counts
+    """
     most_active_monkeys_ls = item_count_ls.copy()
     most_active_monkeys_ls.sort(reverse=True)
     return (most_active_monkeys_ls[0]*most_active_monkeys_ls[1])
 
+def calculate_monkey_business(raw_input, num_rounds, engine="rounds", processes=None, observer=None, relief_divisor=1):
+    """
+    calculates the level of monkey business over num_rounds of shenanigans
+    :param raw_input: raw data
+    :param num_rounds: number of rounds to implement
+    :param engine: "rounds" simulates every round, "cycles" follows each item and skips repeated rounds,
+    "numpy" simulates every round with all items in arrays, "parallel" follows each item in a process pool
+    :param processes: number of worker processes for the parallel engine, None for one per core
+    :param observer: optional RoundObserver, sampled rounds of the rounds engine are reported to it
+    :param relief_divisor: 1 reduces worry levels modulo test_product (part 2), otherwise worry levels are divided
+    by relief_divisor after each inspection (3 for part 1). only the rounds and numpy engines support dividing
+    :return: total amount of monkey business
+    """
+    monkey_ls, test_product = parse_monkeys(raw_input)
+
+    item_count_ls = [0 for x in monkey_ls]
+    if observer and engine != "rounds":
+        raise ValueError("an observer can only be used with the rounds engine")
+    if relief_divisor != 1 and engine not in {"rounds", "numpy"}:
+        raise ValueError(f"the {engine} engine needs worry levels reduced modulo test_product (relief_divisor=1)")
+    if engine == "rounds":
+        #an item is inspected at most once by each monkey per round
+        inspections_per_round = len(monkey_ls)
+        if relief_divisor == 1:
+            relief_modulus = test_product
+        else:
+            relief_modulus = safe_relief_modulus(relief_divisor, test_product, num_rounds*inspections_per_round)
+            round_modulus_step = relief_divisor**inspections_per_round
+        for round_num in range(num_rounds):
+            if observer and round_num % observer.sample_every == 0:
+                monkey_ls, item_count_ls = observed_round_implementer(
+                    monkey_ls, item_count_ls, relief_modulus, relief_divisor, observer, round_num
+                )
+            else:
+                monkey_ls, item_count_ls = round_implementer(monkey_ls, item_count_ls,relief_modulus,relief_divisor)
+            if relief_divisor != 1: #the round is finished, one round fewer left so the modulus can shrink
+                relief_modulus //= round_modulus_step
+    elif engine == "cycles":
+        for monkey_index, curr_monkey in enumerate(monkey_ls):
+            for curr_item in curr_monkey.item_queue:
+                curr_item_count_ls = item_inspection_counts(monkey_ls, monkey_index, curr_item, num_rounds, test_product)
+                item_count_ls = [x+y for x,y in zip(item_count_ls, curr_item_count_ls)]
+    elif engine == "numpy":
+        #worry levels are below test_product before each operation, make sure the results fit in an int64
+        int64_max = np.iinfo(np.int64).max
+        if relief_divisor == 1 and max(x.operate(test_product - 1) for x in monkey_ls) > int64_max:
+            raise ValueError("worry levels can overflow int64, use the rounds engine")
+        worry_arr = np.array([x for curr_monkey in monkey_ls for x in curr_monkey.item_queue], dtype=np.int64)
+        owner_arr = np.array(
+            [i for i, curr_monkey in enumerate(monkey_ls) for x in curr_monkey.item_queue], dtype=np.int64
+        )
+        relief_modulus = test_product if relief_divisor == 1 else None
+        for round_num in range(num_rounds):
+            #worry levels that are divided aren't reduced, so check the next round can't overflow
+            #(an item can pass through several monkeys in a round, so all of them are checked against the largest)
+            if relief_divisor != 1 and worry_arr.size:
+                round_max_worry = int(worry_arr.max())
+                for curr_monkey in monkey_ls:
+                    round_max_worry = max(round_max_worry, curr_monkey.operate(round_max_worry))
+                if round_max_worry > int64_max:
+                    raise OverflowError(f"worry levels overflow int64 in round {round_num}, use the rounds engine")
+            worry_arr, owner_arr, item_count_ls = array_round_implementer(
+                worry_arr, owner_arr, monkey_ls, item_count_ls, relief_modulus, relief_divisor
+            )
+    elif engine == "parallel":
+        #monkeys can't be pickled (their operations are closures) so each worker parses the raw input itself
+        item_tuple_ls = [
+            (monkey_index, curr_item, num_rounds)
+            for monkey_index, curr_monkey in enumerate(monkey_ls) for curr_item in curr_monkey.item_queue
+        ]
+        num_workers = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(
+                max_workers=num_workers,
+                initializer=_init_item_worker,
+                initargs=(raw_input,)
+        ) as pool:
+            chunk_size = max(1, len(item_tuple_ls) // (num_workers * 4))
+            for curr_item_count_ls in pool.map(_item_worker_counts, item_tuple_ls, chunksize=chunk_size):
+                item_count_ls = [x+y for x,y in zip(item_count_ls, curr_item_count_ls)]
+    else:
+        raise ValueError(f"unknown engine {engine}")
+    return monkey_business(item_count_ls)
+
 
 if __name__ == '__main__':
     print(f"level of monkey business: {calculate_monkey_business(data,10000)}")
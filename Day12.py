@@ -1,4 +1,11 @@
 from aocd import data
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import mmap
+import numpy as np
+
+# byte -> elevation lookup, the start and end markers are remapped to 'a' and 'z'
+ELEVATION_TABLE = bytes.maketrans(b'SE', b'az')
 
 
 class TreeNode():
@@ -205,6 +212,272 @@ def min_steps_path_finder_multiple_start(raw_data):
                                                                                      min_path_count)
 
     return min_path_count
+
+def load_height_map(file_path):
+    """
+    memory-maps a heightmap file and views it as a 2-D uint8 array without copying it.
+    the newline at the end of each row is skipped over by the row stride
+    :param file_path: path to the heightmap file
+    :return: read-only uint8 array of shape (rows, columns) backed by the mapped file
+    """
+    with open(file_path, 'rb') as input_file:
+        mapped_file = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return height_map_view(mapped_file)
+
+
+def height_map_view(buffer):
+    """
+    views a newline separated heightmap buffer as a 2-D uint8 array, skipping the newlines with the row stride
+    :param buffer: bytes-like heightmap, e.g. raw_data.encode() or a mapped file
+    :return: read-only uint8 array of shape (rows, columns) sharing memory with buffer
+    """
+    row_length = buffer.find(b'\n')
+    if row_length == -1:  # single row with no newline
+        row_length = len(buffer)
+    num_rows = (len(buffer) + 1) // (row_length + 1)  # last row may not end in a newline
+    return np.ndarray(
+        (num_rows, row_length),
+        dtype=np.uint8,
+        buffer=buffer,
+        strides=(row_length + 1, 1)
+    )
+
+
+def mapped_path_finder(height_map, start_chars=b'S'):
+    """
+    breadth first search run directly on the bytes of a heightmap array (see load_height_map), from every
+    position marked with one of start_chars to E
+    :param height_map: 2-D uint8 array of the raw heightmap characters
+    :param start_chars: characters to start from, b'S' for part 1 and b'Sa' for part 2
+    :return: number of steps in minimum path, None if E can't be reached
+    """
+    num_rows, row_length = height_map.shape
+    row_views = [row.data for row in height_map]  # zero-copy views, indexing gives an int
+    visited = bytearray(num_rows * row_length)  # one byte per position
+
+    unprocessed_coords = deque()
+    for y_coord, x_coord in np.argwhere(np.isin(height_map, list(start_chars))).tolist():
+        visited[y_coord * row_length + x_coord] = 1
+        unprocessed_coords.append((y_coord, x_coord))
+
+    end_value = ord('E')
+    num_steps = 0
+    while unprocessed_coords:
+        # process a whole level of the search at a time so the step count is shared
+        for _ in range(len(unprocessed_coords)):
+            curr_y_coord, curr_x_coord = unprocessed_coords.popleft()
+            curr_value = row_views[curr_y_coord][curr_x_coord]
+            if curr_value == end_value:
+                return num_steps
+            max_elevation = ELEVATION_TABLE[curr_value] + 1
+            for child_y_coord, child_x_coord in (
+                    (curr_y_coord, curr_x_coord - 1),
+                    (curr_y_coord, curr_x_coord + 1),
+                    (curr_y_coord - 1, curr_x_coord),
+                    (curr_y_coord + 1, curr_x_coord),
+            ):
+                if not (0 <= child_y_coord < num_rows and 0 <= child_x_coord < row_length):
+                    continue
+                child_index = child_y_coord * row_length + child_x_coord
+                if visited[child_index]:
+                    continue
+                if ELEVATION_TABLE[row_views[child_y_coord][child_x_coord]] <= max_elevation:
+                    visited[child_index] = 1
+                    unprocessed_coords.append((child_y_coord, child_x_coord))
+        num_steps += 1
+    return None
+
+
+def elevation_grid(height_map):
+    """
+    converts a heightmap array of raw characters into elevations, with S as 'a' and E as 'z'
+    :param height_map: 2-D uint8 array of the raw heightmap characters
+    :return: 2-D int16 array of elevations
+    """
+    return np.frombuffer(ELEVATION_TABLE, dtype=np.uint8)[height_map].astype(np.int16)
+
+
+def move_masks(elevation):
+    """
+    works out which single steps are allowed (at most one higher) for the whole map at once.
+    each mask is indexed by the destination of the step
+    :param elevation: 2-D array of elevations
+    :return: tuple of (left, right, up, down) boolean masks
+    """
+    return (
+        elevation[:, :-1] <= elevation[:, 1:] + 1,  # (y, x+1) -> (y, x)
+        elevation[:, 1:] <= elevation[:, :-1] + 1,  # (y, x) -> (y, x+1)
+        elevation[:-1, :] <= elevation[1:, :] + 1,  # (y+1, x) -> (y, x)
+        elevation[1:, :] <= elevation[:-1, :] + 1,  # (y, x) -> (y+1, x)
+    )
+
+
+def expand_frontier(frontier, masks):
+    """
+    shifts the whole frontier one step in each direction, keeping only the allowed steps
+    :param frontier: boolean array of the positions reached in the last step
+    :param masks: (left, right, up, down) masks from move_masks
+    :return: boolean array of every position reachable in one step from the frontier
+    """
+    left_mask, right_mask, up_mask, down_mask = masks
+    reached = np.zeros_like(frontier)
+    reached[:, :-1] |= frontier[:, 1:] & left_mask
+    reached[:, 1:] |= frontier[:, :-1] & right_mask
+    reached[:-1, :] |= frontier[1:, :] & up_mask
+    reached[1:, :] |= frontier[:-1, :] & down_mask
+    return reached
+
+
+def wavefront_path_finder(height_map, start_chars=b'S'):
+    """
+    breadth first search that expands the whole frontier per step with NumPy masks, from every
+    position marked with one of start_chars to E
+    :param height_map: 2-D uint8 array of the raw heightmap characters (see height_map_view)
+    :param start_chars: characters to start from, b'S' for part 1 and b'Sa' for part 2
+    :return: number of steps in minimum path, None if E can't be reached
+    """
+    masks = move_masks(elevation_grid(height_map))
+    end_mask = height_map == ord('E')
+    frontier = np.isin(height_map, list(start_chars))
+    visited = frontier.copy()
+
+    num_steps = 0
+    while frontier.any():
+        if (frontier & end_mask).any():
+            return num_steps
+        frontier = expand_frontier(frontier, masks) & ~visited
+        visited |= frontier
+        num_steps += 1
+    return None
+
+
+def reverse_move_masks(elevation):
+    """
+    move masks for searching backwards from a target: a reverse step is allowed where the forward step is
+    :param elevation: 2-D array of elevations
+    :return: tuple of (left, right, up, down) boolean masks, indexed by the destination of the reverse step
+    """
+    left_mask, right_mask, up_mask, down_mask = move_masks(elevation)
+    return right_mask, left_mask, down_mask, up_mask
+
+
+def distance_field(reverse_masks, target_coord):
+    """
+    reverse wavefront search from target_coord, giving the minimum steps from every position to the target
+    :param reverse_masks: masks from reverse_move_masks
+    :param target_coord: (y, x) coordinate of the target
+    :return: 2-D int32 array of step counts, -1 where the target can't be reached
+    """
+    map_shape = (reverse_masks[0].shape[0], reverse_masks[2].shape[1])
+    distances = np.full(map_shape, -1, dtype=np.int32)
+    frontier = np.zeros(map_shape, dtype=bool)
+    frontier[target_coord] = True
+    visited = frontier.copy()
+
+    num_steps = 0
+    while frontier.any():
+        distances[frontier] = num_steps
+        frontier = expand_frontier(frontier, reverse_masks) & ~visited
+        visited |= frontier
+        num_steps += 1
+    return distances
+
+
+# masks shared by every task in a router worker process, set once by the pool initializer
+_worker_reverse_masks = None
+
+
+def _init_router_worker(reverse_masks):
+    global _worker_reverse_masks
+    _worker_reverse_masks = reverse_masks
+
+
+def _router_distance_field(target_coord):
+    return distance_field(_worker_reverse_masks, target_coord)
+
+
+class HeightMapRouter():
+    def __init__(self, height_map, cache_size=32, processes=None):
+        """
+        answers many (start, end) queries against one heightmap, reusing a distance field per end position
+        :param height_map: 2-D uint8 array of the raw heightmap characters (see height_map_view/load_height_map)
+        :param cache_size: number of distance fields to keep, least recently used are dropped first
+        :param processes: worker processes for uncached targets, None for one per core, 1 to stay in process.
+        the pool is started on the first batch that needs it and kept until close
+        """
+        self.height_map = height_map
+        self.reverse_masks = reverse_move_masks(elevation_grid(height_map))
+        self.cache_size = cache_size
+        self.processes = processes
+        self.distance_fields = OrderedDict()
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        shuts down the worker pool, a later batch starts a new one
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def get_pool(self):
+        """
+        :return: the router's process pool, started with the reverse masks sent to each worker once
+        """
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_init_router_worker,
+                initargs=(self.reverse_masks,)
+            )
+        return self.pool
+
+    def route(self, start_coord, end_coord):
+        """
+        :return: minimum steps from start_coord to end_coord, None if it can't be reached
+        """
+        return self.route_batch([(start_coord, end_coord)])[0]
+
+    def route_batch(self, query_ls):
+        """
+        answers a batch of queries. targets that aren't cached are searched in the router's process pool
+        :param query_ls: list of ((y, x) start, (y, x) end) pairs
+        :return: list of minimum steps for each query, None where the end can't be reached
+        """
+        target_ls = list(OrderedDict.fromkeys(tuple(end_coord) for _, end_coord in query_ls))
+        batch_fields = {}
+        uncached_target_ls = []
+        for target_coord in target_ls:
+            if target_coord in self.distance_fields:
+                self.distance_fields.move_to_end(target_coord)
+                batch_fields[target_coord] = self.distance_fields[target_coord]
+            else:
+                uncached_target_ls.append(target_coord)
+
+        if len(uncached_target_ls) > 1 and self.processes != 1:
+            computed_field_ls = list(self.get_pool().map(_router_distance_field, uncached_target_ls))
+        else:
+            computed_field_ls = [distance_field(self.reverse_masks, x) for x in uncached_target_ls]
+
+        for target_coord, curr_field in zip(uncached_target_ls, computed_field_ls):
+            batch_fields[target_coord] = curr_field
+            self.distance_fields[target_coord] = curr_field
+            if len(self.distance_fields) > self.cache_size:
+                self.distance_fields.popitem(last=False)
+
+        result_ls = []
+        for start_coord, end_coord in query_ls:
+            num_steps = int(batch_fields[tuple(end_coord)][tuple(start_coord)])
+            result_ls.append(num_steps if num_steps >= 0 else None)
+        return result_ls
+
+
 if __name__ == '__main__':
     print(f"length of minimum path: {min_steps_path_finder(data)}")
     print(f"length of minimum path from any a: {min_steps_path_finder_multiple_start(data)}")
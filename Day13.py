@@ -1,5 +1,16 @@
 from aocd import data
-import ast
+from array import array
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import cmp_to_key, reduce
+import os
+import re
+
+# token values for the flat packet representation, integers in packets are never negative
+OPEN = -1
+CLOSE = -2
+
+PACKET_TOKEN_RE = re.compile(r'[0-9]+|.')
 
 
 def compare_pair(left, right):
@@ -86,17 +97,287 @@ def compare_pair(left, right):
         return None  # so we can proceed to next item in parent list
 
 
+def tokenize_packet(packet):
+    """
+    flattens a packet into a stream of OPEN, CLOSE and integer tokens
+    :param packet: nested list packet
+    :return: array of tokens
+    :raises ValueError: if the packet holds a negative integer or one too large for a token
+
+    >>> tokenize_packet([1,[2,[]],3]).tolist()
+    [-1, 1, -1, 2, -1, -2, -2, 3, -2]
+    >>> tokenize_packet([1,[-2]])
+    Traceback (most recent call last):
+    ...
+    ValueError: malformed packet on packet: negative integer -2: [1, [-2]]
+    """
+    token_arr = array('q', [OPEN])
+    item_stack = [iter(packet)]
+    while item_stack:
+        for curr_item in item_stack[-1]:
+            if isinstance(curr_item, list):
+                token_arr.append(OPEN)
+                item_stack.append(iter(curr_item))
+                break
+            if curr_item < 0: #would be mistaken for OPEN or CLOSE
+                raise _packet_error(f"negative integer {curr_item}", packet, None)
+            try:
+                token_arr.append(curr_item)
+            except OverflowError:
+                raise _packet_error(f"integer too large {curr_item}", packet, None)
+        else: #finished this list
+            token_arr.append(CLOSE)
+            item_stack.pop()
+    return token_arr
+
+def compare_tokens(left_tokens, right_tokens):
+    """
+    compares two tokenized packets without recursion. when an integer meets a list, the integer is treated as
+    being wrapped in a list by skipping the list's OPEN and closing the integer's side right after it
+    :param left_tokens: left packet tokens
+    :param right_tokens: right packet tokens
+    :return: bool of if the pairs are in the right order, None if they are equal
+
+    >>> compare_tokens(tokenize_packet([[1],[2,3,4]]), tokenize_packet([[1],4]))
+    True
+    >>> compare_tokens(tokenize_packet([9]), tokenize_packet([[8,7,6]]))
+    False
+    >>> compare_tokens(tokenize_packet([5]), tokenize_packet([[[5]],1]))
+    True
+    >>> compare_tokens(tokenize_packet([[[]]]), tokenize_packet([[]]))
+    False
+    >>> print(compare_tokens(tokenize_packet([[1]]), tokenize_packet([1])))
+    None
+    """
+    left_index = right_index = 0
+    # virtual CLOSE tokens owed after wrapping an integer: pending until the integer is used, then active
+    left_pending = right_pending = left_active = right_active = 0
+    left_length, right_length = len(left_tokens), len(right_tokens)
+    while left_index < left_length or left_active:
+        left_token = CLOSE if left_active else left_tokens[left_index]
+        right_token = CLOSE if right_active else right_tokens[right_index]
+
+        if left_token >= 0 and right_token >= 0: # both are int
+            if left_token < right_token:
+                return True
+            elif left_token > right_token:
+                return False
+            left_index += 1
+            right_index += 1
+            left_active, left_pending = left_pending, 0
+            right_active, right_pending = right_pending, 0
+        elif left_token == right_token: # both OPEN or both CLOSE
+            if left_active:
+                left_active -= 1
+            else:
+                left_index += 1
+            if right_active:
+                right_active -= 1
+            else:
+                right_index += 1
+        elif left_token == CLOSE: # left ran out of items
+            return True
+        elif right_token == CLOSE: # right ran out of items
+            return False
+        elif left_token >= 0: # left is int, right is list
+            left_pending += 1
+            right_index += 1
+        else: # left is list, right is int
+            right_pending += 1
+            left_index += 1
+    return None
+
+def _packet_error(message, line, line_num):
+    location = f"line {line_num}" if line_num is not None else "packet"
+    return ValueError(f"malformed packet on {location}: {message}: {line!r}")
+
+def parse_packet_tokens(line, line_num=None):
+    """
+    parses a packet string straight into tokens in a single pass, checking it is a well formed packet
+    :param line: packet string
+    :param line_num: line number reported if the packet is malformed
+    :return: array of tokens
+
+    >>> parse_packet_tokens("[1,[2,[]],3]").tolist()
+    [-1, 1, -1, 2, -1, -2, -2, 3, -2]
+    >>> parse_packet_tokens("[1,,2]", 7)
+    Traceback (most recent call last):
+    ...
+    ValueError: malformed packet on line 7: unexpected ',' at column 4: '[1,,2]'
+    """
+    token_arr = array('q')
+    depth = 0
+    expect_item = True #after an OPEN or a comma
+    prev_token = None
+    column = 1
+    for curr_token in PACKET_TOKEN_RE.findall(line):
+        if curr_token == '[':
+            if not expect_item or (depth == 0 and token_arr):
+                raise _packet_error(f"unexpected '[' at column {column}", line, line_num)
+            token_arr.append(OPEN)
+            depth += 1
+        elif curr_token == ']':
+            if depth == 0 or prev_token == ',':
+                raise _packet_error(f"unexpected ']' at column {column}", line, line_num)
+            token_arr.append(CLOSE)
+            depth -= 1
+            expect_item = False
+        elif curr_token == ',':
+            if expect_item or depth == 0:
+                raise _packet_error(f"unexpected ',' at column {column}", line, line_num)
+            expect_item = True
+        elif curr_token[0] in '0123456789':
+            if not expect_item or depth == 0:
+                raise _packet_error(f"unexpected integer at column {column}", line, line_num)
+            try:
+                token_arr.append(int(curr_token))
+            except OverflowError:
+                raise _packet_error(f"integer too large at column {column}", line, line_num)
+            expect_item = False
+        else:
+            raise _packet_error(f"unexpected {curr_token!r} at column {column}", line, line_num)
+        prev_token = curr_token
+        column += len(curr_token)
+    if depth != 0 or not token_arr:
+        raise _packet_error("unclosed or empty packet", line, line_num)
+    return token_arr
+
+def packet_from_tokens(token_arr):
+    """
+    rebuilds the nested list packet from its tokens
+    :param token_arr: array of tokens
+    :return: nested list packet
+
+    >>> packet_from_tokens(tokenize_packet([1,[2,[]],3]))
+    [1, [2, []], 3]
+    """
+    list_stack = [[]]
+    for curr_token in token_arr:
+        if curr_token == OPEN:
+            list_stack.append([])
+        elif curr_token == CLOSE:
+            finished_ls = list_stack.pop()
+            list_stack[-1].append(finished_ls)
+        else:
+            list_stack[-1].append(curr_token)
+    return list_stack[0][0]
+
+def parse_packet(line, line_num=None):
+    """
+    parses a packet string into nested lists, see parse_packet_tokens
+    :param line: packet string
+    :param line_num: line number reported if the packet is malformed
+    :return: nested list packet
+    """
+    return packet_from_tokens(parse_packet_tokens(line, line_num))
+
+def parse_packet_lines(raw_data):
+    """
+    parses every packet in the raw data, skipping the blank lines between pairs
+    :param raw_data: raw input
+    :return: list of packet token arrays
+    """
+    return [parse_packet_tokens(line, line_num) for line_num, line in enumerate(raw_data.split('\n'), 1) if line]
+
 def order_count(raw_data):
     """
     takes the raw data and determines how many pairs are in the right order
     :param raw_data:
     :return: sum of the indices of the pairs out of order
     """
-    data_pair_ls = [[ast.literal_eval(y) for y in sublist.split('\n')] for sublist in raw_data.split('\n\n')]
-    right_order_pairs_ls = list(map(lambda pair: compare_pair(pair[0], pair[1]), data_pair_ls))
+    packet_token_ls = parse_packet_lines(raw_data)
+    if len(packet_token_ls) % 2:
+        raise ValueError("packets don't pair up, there is an odd number of them")
+    data_pair_ls = list(zip(packet_token_ls[0::2], packet_token_ls[1::2]))
+    right_order_pairs_ls = list(map(lambda pair: compare_tokens(pair[0], pair[1]), data_pair_ls))
     right_order_pair_index_ls = [i+1 for i,x in enumerate(right_order_pairs_ls) if x]
     return sum(right_order_pair_index_ls)
 
+def pair_chunks(line_iter, chunk_size):
+    """
+    groups packet lines into chunks of pairs, keeping the raw text so the chunks are cheap to send to workers
+    :param line_iter: iterable of input lines, e.g. an open file
+    :param chunk_size: number of pairs in each chunk
+    :return: generator of (index of first pair, list of (left line number, left line, right line number, right line))
+    chunks
+    """
+    first_pair_index = 1
+    chunk_ls = []
+    left_line = left_line_num = None
+    for line_num, line in enumerate(line_iter, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if left_line is None:
+            left_line, left_line_num = line, line_num
+            continue
+        chunk_ls.append((left_line_num, left_line, line_num, line))
+        left_line = None
+        if len(chunk_ls) == chunk_size:
+            yield first_pair_index, chunk_ls
+            first_pair_index += len(chunk_ls)
+            chunk_ls = []
+    if left_line is not None:
+        raise ValueError("packets don't pair up, there is an odd number of them")
+    if chunk_ls:
+        yield first_pair_index, chunk_ls
+
+def _order_count_chunk(chunk):
+    first_pair_index, chunk_ls = chunk
+    index_sum = 0
+    for pair_index, (left_line_num, left_line, right_line_num, right_line) in enumerate(chunk_ls, first_pair_index):
+        left_tokens = parse_packet_tokens(left_line, left_line_num)
+        if compare_tokens(left_tokens, parse_packet_tokens(right_line, right_line_num)):
+            index_sum += pair_index
+    return index_sum
+
+def parallel_order_count(line_iter, chunk_size=10000, processes=None):
+    """
+    order_count spread over a process pool. chunks of raw pair text are parsed and compared by the workers and
+    only a few chunks are in flight at once, so line_iter can stream from a file larger than memory
+    :param line_iter: iterable of input lines
+    :param chunk_size: number of pairs in each chunk
+    :param processes: number of worker processes, None for one per core
+    :return: sum of the indices of the pairs in the right order
+    """
+    max_in_flight = 2 * (processes or os.cpu_count() or 1)
+    index_sum = 0
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        future_queue = deque()
+        for chunk in pair_chunks(line_iter, chunk_size):
+            future_queue.append(pool.submit(_order_count_chunk, chunk))
+            if len(future_queue) >= max_in_flight:
+                index_sum += future_queue.popleft().result()
+        while future_queue:
+            index_sum += future_queue.popleft().result()
+    return index_sum
+
+def order_count_from_file(file_path, chunk_size=10000, processes=None):
+    """
+    streams pairs from an input file and determines how many pairs are in the right order in a process pool
+    :param file_path: path to input file
+    :param chunk_size: number of pairs in each chunk
+    :param processes: number of worker processes, None for one per core
+    :return: sum of the indices of the pairs in the right order
+    """
+    with open(file_path) as input_file:
+        return parallel_order_count(input_file, chunk_size, processes)
+
+def packet_order(left_tokens, right_tokens):
+    """
+    three-way comparison of two tokenized packets, for use as a sort comparator
+    :param left_tokens: left packet tokens
+    :param right_tokens: right packet tokens
+    :return: -1 if left comes first, 1 if right comes first, 0 if they are equal
+
+    >>> [packet_order(tokenize_packet([3]), tokenize_packet(x)) for x in [[5], [[3]], [2]]]
+    [-1, 0, 1]
+    """
+    result = compare_tokens(left_tokens, right_tokens)
+    if result is None:
+        return 0
+    return -1 if result else 1
+
 def sort_packets(packet_ls):
     """
     sorts packet list and returns sorted list
@@ -105,40 +386,194 @@ def sort_packets(packet_ls):
 
     >>> sort_packets([[[4,4],4,4],[7,7,7,7],[9],[[[]]],[7,7,7]])
     [[[[]]], [[4, 4], 4, 4], [7, 7, 7], [7, 7, 7, 7], [9]]
+    >>> sort_packets([[2**31],[1]])
+    [[1], [2147483648]]
     """
-    if len(packet_ls)<=1:
-        return packet_ls
-    partition = packet_ls[-1]
+    #each packet is tokenized once, the sort itself is the built in timsort
+    token_ls = [tokenize_packet(packet) for packet in packet_ls]
+    sorted_index_ls = sorted(
+        range(len(packet_ls)),
+        key=cmp_to_key(lambda x, y: packet_order(token_ls[x], token_ls[y]))
+    )
+    return [packet_ls[x] for x in sorted_index_ls]
+
+class PacketComparer():
+    def __init__(self, cache_size=100000):
+        """
+        compares packets by interned id, so repeated packets and sub-lists are only compared once.
+        each list is stored as a tuple of its items, integers as themselves and sub-lists as -(id+1), so equal
+        lists always hash to the same entry and get the same id
+        :param cache_size: number of comparison results to keep, least recently used are dropped first
+        """
+        self.packet_id_dict = {} #list tuple -> id
+        self.packet_ls = [] #id -> list tuple
+        self.cache_size = cache_size
+        self.compare_cache = OrderedDict() #(left id, right id) -> -1, 0 or 1
+        self.hits = 0
+        self.misses = 0
+
+    def _intern_list(self, list_tuple):
+        packet_id = self.packet_id_dict.get(list_tuple)
+        if packet_id is None:
+            packet_id = len(self.packet_ls)
+            self.packet_id_dict[list_tuple] = packet_id
+            self.packet_ls.append(list_tuple)
+        return packet_id
 
-    small_ls = []
-    large_ls = []
+    def intern_tokens(self, token_arr):
+        """
+        :param token_arr: array of packet tokens
+        :return: id of the packet, every sub-list is interned along the way
+        """
+        item_stack = []
+        for curr_token in token_arr:
+            if curr_token == OPEN:
+                item_stack.append([])
+            elif curr_token == CLOSE:
+                packet_id = self._intern_list(tuple(item_stack.pop()))
+                if not item_stack:
+                    return packet_id
+                item_stack[-1].append(-packet_id - 1)
+            else:
+                item_stack[-1].append(curr_token)
 
-    for value in packet_ls[:-1]:
-        if compare_pair(value, partition): #value is less than partition
-            small_ls.append(value)
-        else: #value is larger than partition
-            large_ls.append(value)
+    def intern(self, packet):
+        """
+        :param packet: nested list packet
+        :return: id of the packet
+        """
+        return self.intern_tokens(tokenize_packet(packet))
 
-    return sort_packets(small_ls)+[partition]+sort_packets(large_ls)
+    def compare_ids(self, left_id, right_id):
+        """
+        three-way comparison of two interned packets, results for each pair of ids are memoized
+        :return: -1 if left comes first, 1 if right comes first, 0 if they are equal
+        """
+        if left_id == right_id:
+            return 0
+        cache_key = (left_id, right_id)
+        result = self.compare_cache.get(cache_key)
+        if result is not None:
+            self.hits += 1
+            self.compare_cache.move_to_end(cache_key)
+            return result
+        self.misses += 1
 
-def find_decoder_key(raw_data):
+        left_list, right_list = self.packet_ls[left_id], self.packet_ls[right_id]
+        result = 0
+        for left_item, right_item in zip(left_list, right_list):
+            if left_item >= 0 and right_item >= 0: # both are int
+                if left_item != right_item:
+                    result = -1 if left_item < right_item else 1
+                    break
+            else: # at least one is a list, an int is compared as a list holding it
+                left_sub_id = -left_item - 1 if left_item < 0 else self._intern_list((left_item,))
+                right_sub_id = -right_item - 1 if right_item < 0 else self._intern_list((right_item,))
+                result = self.compare_ids(left_sub_id, right_sub_id)
+                if result:
+                    break
+        else: # one ran out of items
+            result = (len(left_list) > len(right_list)) - (len(left_list) < len(right_list))
+
+        self.compare_cache[cache_key] = result
+        if len(self.compare_cache) > self.cache_size:
+            self.compare_cache.popitem(last=False)
+        return result
+
+    def order_count(self, raw_data):
+        """
+        same as order_count, with the comparisons memoized
+        :param raw_data: raw input
+        :return: sum of the indices of the pairs in the right order
+        """
+        packet_id_ls = [self.intern_tokens(x) for x in parse_packet_lines(raw_data)]
+        if len(packet_id_ls) % 2:
+            raise ValueError("packets don't pair up, there is an odd number of them")
+        pair_ls = zip(packet_id_ls[0::2], packet_id_ls[1::2])
+        return sum(i+1 for i, (left_id, right_id) in enumerate(pair_ls) if self.compare_ids(left_id, right_id) < 0)
+
+    def sort_packets(self, packet_ls):
+        """
+        same as sort_packets, with the comparisons memoized
+        :param packet_ls: list of packets to sort
+        :return: sorted list
+        """
+        packet_id_ls = [self.intern(packet) for packet in packet_ls]
+        sorted_index_ls = sorted(
+            range(len(packet_ls)),
+            key=cmp_to_key(lambda x, y: self.compare_ids(packet_id_ls[x], packet_id_ls[y]))
+        )
+        return [packet_ls[x] for x in sorted_index_ls]
+
+    def cache_info(self):
+        """
+        :return: dictionary of cache hits, misses, cached results and interned lists
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.compare_cache),
+            "interned": len(self.packet_ls),
+        }
+
+DIVIDER_PACKETS = [
+    [[2]],
+    [[6]],
+]
+
+def divider_positions(packet_iter, divider_packets=DIVIDER_PACKETS):
+    """
+    finds where each divider packet would land if the packets and dividers were sorted, without sorting.
+    a divider's position is one more than the number of packets and other dividers that come before it
+    :param packet_iter: iterable of packets (nested lists or token arrays), only read once
+    :param divider_packets: list of divider packets
+    :return: list of 1-based positions of the divider packets
+
+    >>> divider_positions(iter([[1], [3], [[1], 4], [7]]), [[[2]], [[6]]])
+    [3, 5]
+    """
+    divider_token_ls = [tokenize_packet(x) for x in divider_packets]
+    #dividers that come before each divider
+    position_ls = [
+        1 + sum(compare_tokens(other_tokens, divider_tokens) is True for other_tokens in divider_token_ls)
+        for divider_tokens in divider_token_ls
+    ]
+    for packet in packet_iter:
+        packet_tokens = packet if isinstance(packet, array) else tokenize_packet(packet)
+        for divider_index, divider_tokens in enumerate(divider_token_ls):
+            if compare_tokens(packet_tokens, divider_tokens):
+                position_ls[divider_index] += 1
+    return position_ls
+
+def read_packets(file_path):
+    """
+    streams the packets of an input file one at a time, skipping the blank lines between pairs
+    :param file_path: path to input file
+    :return: generator of packet token arrays
+    """
+    with open(file_path) as input_file:
+        for line_num, line in enumerate(input_file, 1):
+            line = line.strip()
+            if line:
+                yield parse_packet_tokens(line, line_num)
+
+def find_decoder_key(raw_data, divider_packets=DIVIDER_PACKETS):
     """
     finds the decoder key
     :param raw_data: raw input
-    :return: decoder key
+    :param divider_packets: list of divider packets
+    :return: decoder key, product of the divider packet positions
     """
-    divider_packets = [
-            [[2]],
-            [[6]],
-        ]
+    return reduce(lambda x,y: x*y, divider_positions(parse_packet_lines(raw_data), divider_packets))
 
-    packet_list = [ast.literal_eval(y) for y in raw_data.replace('\n\n','\n').split('\n')]
-    sorted_packet_ls = sort_packets(
-        packet_list+divider_packets
-    )
-    divider_packet_indicies = [sorted_packet_ls.index(divider_packet)+1 for divider_packet in divider_packets]
-    decoder_key = divider_packet_indicies[0]*divider_packet_indicies[1]
-    return decoder_key
+def decoder_key_from_file(file_path, divider_packets=DIVIDER_PACKETS):
+    """
+    finds the decoder key from an input file, without keeping the packets in memory
+    :param file_path: path to input file
+    :param divider_packets: list of divider packets
+    :return: decoder key, product of the divider packet positions
+    """
+    return reduce(lambda x,y: x*y, divider_positions(read_packets(file_path), divider_packets))
 if __name__ == '__main__':
     print(f"sum of indices {order_count(data)}")
     print(f"decoder key is {find_decoder_key(data)}")
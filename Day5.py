@@ -1,4 +1,7 @@
 from aocd import data
+import re
+
+INSTRUCTION_RE = re.compile(r'move (\d+) from (\d+) to (\d+)')
 
 def data_formatter(raw_input):
     """
@@ -9,9 +12,20 @@ def data_formatter(raw_input):
     #spit on the blank line
     raw_diagram,raw_instructions = raw_input.split("\n\n")
 
-    #diagram: llisted from top to bottom of each stack
+    itemized_diagram = diagram_formatter(raw_diagram.split('\n'))
 
-    split_diagram = [stack for stack in raw_diagram.split('\n')]
+    #instructions
+    split_instructions = [[int(x) for x in step] for step in INSTRUCTION_RE.findall(raw_instructions)]
+
+    return ([itemized_diagram,split_instructions])
+
+def diagram_formatter(split_diagram):
+    """
+    turns the lines of the starting stack diagram into lists of crates
+    :param split_diagram: list of diagram lines, the last one is the stack numbers
+    :return: list of stacks, each listed from top to bottom
+    """
+    #diagram: llisted from top to bottom of each stack
     num_stacks = len(split_diagram[-1].replace(" ",""))
     split_diagram = split_diagram[:-1]
 
@@ -24,12 +38,7 @@ def data_formatter(raw_input):
                 curr_item = curr_layer[curr_index]
                 if curr_item != ' ':
                     itemized_diagram[stack_index].append(curr_item)
-
-    #instructions
-    split_instructions = [step.split(' ') for step in raw_instructions.split('\n')]
-    split_instructions = [[int(x) for x in y if x not in {'move','from','to'}] for y in split_instructions]
-
-    return ([itemized_diagram,split_instructions])
+    return itemized_diagram
 
 def test_data_formatter():
     with open("Day5_test_input.txt","r") as input_file:
@@ -111,6 +120,226 @@ def step_implementer_9001(stack_diagram, curr_instruction):
         stack_diagram[to_stack_index] = crates_to_move + stack_diagram[to_stack_index]
     return stack_diagram
 
+def stack_step_9000(stack_ls, curr_instruction):
+    """
+    performs the current step on stacks stored bottom to top (the top crate is at the end of each list),
+    the moved crates are spliced on in reverse as they are moved one at a time
+    :param stack_ls: list of stacks, bottom crate first
+    :param curr_instruction: list of instruction in form [move,from,to]
+    :return: edited stack list
+
+    usage examples:
+
+    >>> stack_step_9000([['Z', 'N'], ['M', 'C', 'D'], ['P']],[1,2,1])
+    [['Z', 'N', 'D'], ['M', 'C'], ['P']]
+
+    >>> stack_step_9000([['Z', 'N', 'D'], ['M', 'C'], ['P']],[3,1,3])
+    [[], ['M', 'C'], ['P', 'D', 'N', 'Z']]
+    """
+    num_crates = curr_instruction[0]
+    if num_crates > 0 and curr_instruction[1] != curr_instruction[2]: #moving onto the same stack changes nothing
+        from_stack = stack_ls[curr_instruction[1]-1]
+        crates_to_move = from_stack[-num_crates:]
+        del from_stack[-num_crates:]
+        crates_to_move.reverse()
+        stack_ls[curr_instruction[2]-1].extend(crates_to_move)
+    return stack_ls
+
+def stack_step_9001(stack_ls, curr_instruction):
+    """
+    performs the current step on stacks stored bottom to top (the top crate is at the end of each list),
+    the moved crates keep their order
+    :param stack_ls: list of stacks, bottom crate first
+    :param curr_instruction: list of instruction in form [move,from,to]
+    :return: edited stack list
+
+    usage examples:
+
+    >>> stack_step_9001([['Z', 'N', 'D'], ['M', 'C'], ['P']],[3,1,3])
+    [[], ['M', 'C'], ['P', 'Z', 'N', 'D']]
+    """
+    num_crates = curr_instruction[0]
+    if num_crates > 0 and curr_instruction[1] != curr_instruction[2]: #moving onto the same stack changes nothing
+        from_stack = stack_ls[curr_instruction[1]-1]
+        stack_ls[curr_instruction[2]-1].extend(from_stack[-num_crates:])
+        del from_stack[-num_crates:]
+    return stack_ls
+
+class CrateRope():
+    def __init__(self, crate_ls):
+        """
+        a stack of crates kept as segments of shared blocks, so moving crates costs the number of segments
+        touched rather than the number of crates.
+        each segment is (block, start, stop, is_reversed), the crates block[start:stop] read bottom to top,
+        or top to bottom if is_reversed. segment_ls is ordered bottom to top
+        :param crate_ls: list of crates, bottom crate first
+        """
+        self.segment_ls = [(crate_ls, 0, len(crate_ls), False)] if crate_ls else []
+        self.num_crates = len(crate_ls)
+
+    def take_top(self, num_crates):
+        """
+        removes the top num_crates crates (all of them if there are fewer), splitting at most one segment
+        :param num_crates: number of crates to remove
+        :return: removed segments, bottom to top
+        """
+        num_crates = min(num_crates, self.num_crates)
+        self.num_crates -= num_crates
+        taken_ls = []
+        while num_crates:
+            block, start, stop, is_reversed = self.segment_ls.pop()
+            if stop - start <= num_crates: #take the whole segment
+                taken_ls.append((block, start, stop, is_reversed))
+                num_crates -= stop - start
+            elif is_reversed: #top crates are at the start of the block
+                taken_ls.append((block, start, start + num_crates, True))
+                self.segment_ls.append((block, start + num_crates, stop, True))
+                num_crates = 0
+            else: #top crates are at the end of the block
+                taken_ls.append((block, stop - num_crates, stop, False))
+                self.segment_ls.append((block, start, stop - num_crates, False))
+                num_crates = 0
+        taken_ls.reverse()
+        return taken_ls
+
+    def put_top(self, segment_ls):
+        """
+        :param segment_ls: segments to add to the top of the stack, bottom to top
+        """
+        self.segment_ls.extend(segment_ls)
+        self.num_crates += sum(stop - start for block, start, stop, is_reversed in segment_ls)
+
+    def top(self):
+        """
+        :return: top crate, None if the stack is empty
+        """
+        if not self.segment_ls:
+            return None
+        block, start, stop, is_reversed = self.segment_ls[-1]
+        return block[start] if is_reversed else block[stop - 1]
+
+    def crates(self):
+        """
+        :return: list of crates, bottom crate first
+        """
+        crate_ls = []
+        for block, start, stop, is_reversed in self.segment_ls:
+            crate_ls += block[start:stop][::-1] if is_reversed else block[start:stop]
+        return crate_ls
+
+def rope_step(rope_ls, curr_instruction, crane_version):
+    """
+    performs the current step on CrateRope stacks. the 9000 crane moves crates one at a time, which reverses
+    them, so the moved segments are put down in reverse order with their reversed flags flipped
+    :param rope_ls: list of CrateRope stacks
+    :param curr_instruction: list of instruction in form [move,from,to]
+    :param crane_version: "9000" or "9001"
+    :return: edited rope list
+
+    usage examples:
+
+    >>> [x.crates() for x in rope_step([CrateRope(['Z', 'N', 'D']), CrateRope(['M', 'C']), CrateRope(['P'])],[3,1,3],'9000')]
+    [[], ['M', 'C'], ['P', 'D', 'N', 'Z']]
+
+    >>> [x.crates() for x in rope_step([CrateRope(['Z', 'N', 'D']), CrateRope(['M', 'C']), CrateRope(['P'])],[2,1,3],'9001')]
+    [['Z'], ['M', 'C'], ['P', 'N', 'D']]
+    """
+    if curr_instruction[1] == curr_instruction[2]: #moving onto the same stack changes nothing
+        return rope_ls
+    moved_segment_ls = rope_ls[curr_instruction[1]-1].take_top(curr_instruction[0])
+    if crane_version == "9000":
+        moved_segment_ls = [
+            (block, start, stop, not is_reversed) for block, start, stop, is_reversed in reversed(moved_segment_ls)
+        ]
+    rope_ls[curr_instruction[2]-1].put_top(moved_segment_ls)
+    return rope_ls
+
+def rope_instruction_implementer(raw_input, crane_version):
+    """
+    same as instruction_implementer, with each stack kept as a CrateRope so large moves don't copy crates
+    :param raw_input: unformatted data
+    :return: list of top crates in each stack
+    """
+    stack_diagram, instruction_list = data_formatter(raw_input)
+    rope_ls = [CrateRope(stack[::-1]) for stack in stack_diagram]
+    for curr_instruction in instruction_list:
+        rope_ls = rope_step(rope_ls, curr_instruction, crane_version)
+    return "".join([x.top() if x.num_crates>0 else " " for x in rope_ls])
+
+def stream_instructions(input_file):
+    """
+    lazily parses the instruction section of an open input file, one line at a time
+    :param input_file: open input file, positioned after the diagram
+    :return: generator of (move, from, to) tuples
+    """
+    for line in input_file:
+        if not line.strip():
+            continue
+        instruction_match = INSTRUCTION_RE.match(line)
+        if not instruction_match:
+            raise ValueError(f"unexpected instruction: {line!r}")
+        yield int(instruction_match.group(1)), int(instruction_match.group(2)), int(instruction_match.group(3))
+
+def stream_instruction_implementer(file_path, crane_version):
+    """
+    same as instruction_implementer, but reads the input file as it goes so only the stacks are held in memory
+    :param file_path: path to input file
+    :return: list of top crates in each stack
+    """
+    with open(file_path, "r") as input_file:
+        split_diagram = []
+        for line in input_file: #the diagram ends at the first blank line
+            if not line.strip():
+                break
+            split_diagram.append(line.rstrip('\n'))
+        stack_ls = [stack[::-1] for stack in diagram_formatter(split_diagram)]
+        step_implementer = stack_step_9000 if crane_version == "9000" else stack_step_9001
+        for curr_instruction in stream_instructions(input_file):
+            step_implementer(stack_ls, curr_instruction)
+    return "".join([x[-1] if len(x)>0 else " " for x in stack_ls ])
+
+def backward_top_crates(raw_input, crane_version):
+    """
+    finds the top crate in each stack without moving any crates. only the stack heights are followed forwards,
+    then each final top position is traced backwards through the instructions to the crate that started there
+    :param raw_input: unformatted data
+    :param crane_version: "9000" or "9001"
+    :return: list of top crates in each stack
+    """
+    stack_diagram, instruction_list = data_formatter(raw_input)
+
+    #how many crates each instruction really moves (fewer if the from stack runs out)
+    height_ls = [len(x) for x in stack_diagram]
+    moved_count_ls = []
+    for num_crates, from_num, to_num in instruction_list:
+        num_moved = min(num_crates, height_ls[from_num-1])
+        height_ls[from_num-1] -= num_moved
+        height_ls[to_num-1] += num_moved
+        moved_count_ls.append(num_moved)
+
+    top_crate_ls = []
+    for stack_index in range(len(stack_diagram)):
+        if height_ls[stack_index] == 0:
+            top_crate_ls.append(" ")
+            continue
+        #position of the crate, counted from the top of its stack
+        curr_stack_index, curr_depth = stack_index, 0
+        for curr_instruction, num_moved in zip(reversed(instruction_list), reversed(moved_count_ls)):
+            from_index, to_index = curr_instruction[1]-1, curr_instruction[2]-1
+            if from_index == to_index:
+                continue
+            if curr_stack_index == to_index:
+                if curr_depth < num_moved: #crate was one of the moved crates
+                    curr_stack_index = from_index
+                    if crane_version == "9000": #moved one at a time, so the order was reversed
+                        curr_depth = num_moved - 1 - curr_depth
+                else:
+                    curr_depth -= num_moved
+            elif curr_stack_index == from_index:
+                curr_depth += num_moved
+        top_crate_ls.append(stack_diagram[curr_stack_index][curr_depth])
+    return "".join(top_crate_ls)
+
 def instruction_implementer(raw_input, crane_version):
     """
     takes the raw input, splits into stack diagram and instruction list,
@@ -119,13 +348,15 @@ def instruction_implementer(raw_input, crane_version):
     :return: list of top crates in each stack
     """
     stack_diagram, instruction_list = data_formatter(raw_input)
+    #the diagram lists each stack top first, flip them so crates are moved at the end of the lists
+    stack_ls = [stack[::-1] for stack in stack_diagram]
     if crane_version == "9000":
         for curr_instruction in instruction_list:
-            stack_diagram = step_implementer_9000(stack_diagram, curr_instruction)
+            stack_ls = stack_step_9000(stack_ls, curr_instruction)
     elif crane_version == "9001":
         for curr_instruction in instruction_list:
-            stack_diagram = step_implementer_9001(stack_diagram, curr_instruction)
-    return "".join([x[0] if len(x)>0 else " " for x in stack_diagram ])
+            stack_ls = stack_step_9001(stack_ls, curr_instruction)
+    return "".join([x[-1] if len(x)>0 else " " for x in stack_ls ])
 
 
 
@@ -139,10 +370,29 @@ def test_instruction_implementer_9001():
         raw_test_input = input_file.read()
     assert instruction_implementer(raw_test_input, '9001') == 'MCD'
 
+def test_stream_instruction_implementer():
+    assert stream_instruction_implementer("Day5_test_input.txt", '9000') == 'CMZ'
+    assert stream_instruction_implementer("Day5_test_input.txt", '9001') == 'MCD'
+
+def test_backward_top_crates():
+    with open("Day5_test_input.txt","r") as input_file:
+        raw_test_input = input_file.read()
+    assert backward_top_crates(raw_test_input, '9000') == 'CMZ'
+    assert backward_top_crates(raw_test_input, '9001') == 'MCD'
+
+def test_rope_instruction_implementer():
+    with open("Day5_test_input.txt","r") as input_file:
+        raw_test_input = input_file.read()
+    assert rope_instruction_implementer(raw_test_input, '9000') == 'CMZ'
+    assert rope_instruction_implementer(raw_test_input, '9001') == 'MCD'
+
 if __name__ == "__main__":
     test_data_formatter()
     test_instruction_implementer_9000()
     test_instruction_implementer_9001()
+    test_rope_instruction_implementer()
+    test_stream_instruction_implementer()
+    test_backward_top_crates()
 
     elf_message_1 = instruction_implementer(data, '9000')
     elf_message_2 = instruction_implementer(data, '9001')
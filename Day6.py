@@ -1,4 +1,43 @@
 from aocd import data
+from collections import defaultdict
+
+def marker_finder(datastring, window):
+    """
+    given the datastring, finds the number of characters that need to be processed before the first window
+    distinct characters are found. keeps the last index of every character, so each character is only looked at
+    once and the start of the window jumps past the earlier copy of any repeated character
+    :param datastring: string (or bytes) of characters to analyze
+    :param window: number of distinct characters in the marker
+    :return: number of characters that needed to be processed to find the marker, None if there isn't one
+
+    usage examples:
+    >>> marker_finder("mjqjpqmgbljsphdztnvjfqwrcgsmlb", 4)
+    7
+
+    >>> marker_finder(b"mjqjpqmgbljsphdztnvjfqwrcgsmlb", 14)
+    19
+
+    >>> print(marker_finder("aabb", 3))
+    None
+
+    >>> marker_finder("a€a€b€", 3)
+    5
+    """
+    last_seen_ls = [-1] * 256
+    if isinstance(datastring, str):
+        try:
+            datastring = datastring.encode('latin-1') #one byte per character
+        except UnicodeEncodeError:
+            #characters past latin-1 don't fit the byte table, keep their last index in a dict instead
+            last_seen_ls = defaultdict(lambda: -1)
+    window_start = 0
+    for index, char_code in enumerate(datastring):
+        if last_seen_ls[char_code] >= window_start:
+            window_start = last_seen_ls[char_code] + 1
+        last_seen_ls[char_code] = index
+        if index - window_start + 1 == window:
+            return index + 1
+    return None
 
 def sop_marker_finder(datastring):
     """
@@ -23,10 +62,7 @@ def sop_marker_finder(datastring):
     >>> sop_marker_finder("zcfzfwzzqfrljwzlrfnpqdbhtmscgvjw")
     11
     """
-
-    for index in range(len(datastring)):
-       if len(set(datastring[index:index+4]))==4:
-           return index+4
+    return marker_finder(datastring, 4)
 
 def som_marker_finder(datastring):
     """
@@ -51,10 +87,7 @@ def som_marker_finder(datastring):
     >>> som_marker_finder("zcfzfwzzqfrljwzlrfnpqdbhtmscgvjw")
     26
     """
-
-    for index in range(len(datastring)):
-       if len(set(datastring[index:index+14]))==14:
-           return index+14
+    return marker_finder(datastring, 14)
 
 
 
@@ -1,6 +1,21 @@
-import pandas as pd
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from aocd import data
 
+def load_grid(raw_data):
+    """
+    converts the raw digits into a 2-D array of tree heights in one step
+    :param raw_data: raw input
+    :return: 2-D uint8 array of tree heights
+    """
+    grid_bytes = raw_data.strip().encode() + b"\n"
+    row_length = grid_bytes.index(b"\n")
+    #every row plus its newline is row_length + 1 bytes, the newline column is dropped
+    return np.frombuffer(grid_bytes, dtype=np.uint8).reshape(-1, row_length + 1)[:, :row_length] - ord("0")
+
 def is_visible(grid_df, curr_location):
     """
     determines if the value in the curr_location is visible from outside the grid
@@ -24,24 +39,38 @@ def is_visible(grid_df, curr_location):
             return True
     return False
 
+def visible_from_west(height_arr):
+    """
+    finds the trees visible from the west edge of each row, i.e. taller than every tree to their west
+    :param height_arr: 2-D array of tree heights
+    :return: boolean array, True where the tree is visible from the west
+    """
+    height_arr = height_arr.astype(np.int16)
+    #tallest tree west of each position, -1 for the edge so edge trees are always visible
+    west_max_arr = np.full_like(height_arr, -1)
+    west_max_arr[:, 1:] = np.maximum.accumulate(height_arr, axis=1)[:, :-1]
+    return height_arr > west_max_arr
+
+def visibility_mask(height_arr):
+    """
+    finds every tree visible from outside the grid using running maxima from all four directions
+    :param height_arr: 2-D array of tree heights
+    :return: boolean array, True where the tree is visible
+    """
+    return (
+        visible_from_west(height_arr) |
+        visible_from_west(height_arr[:, ::-1])[:, ::-1] | #east
+        visible_from_west(height_arr.T).T | #north
+        visible_from_west(height_arr[::-1, :].T).T[::-1, :] #south
+    )
+
 def num_visible(raw_data):
     """
-    takes the raw data, formats into dataframe, and counts number of visible trees
+    takes the raw data, formats into an array, and counts number of visible trees
     :param raw_data: raw input
     :return: number of visible trees
     """
-    split_data = [y for y in raw_data.split("\n")]
-    grid_df = pd.DataFrame([[*x] for x in split_data]).applymap(lambda x: int(x))
-    #outer ring of trees are all visible, only need to check inner trees
-    coord_list = [(x, y) for x in range(1, grid_df.index.size - 1) for y in range(1, grid_df.columns.size - 1)]
-    visible_tree_ls = list(map(lambda x: is_visible(grid_df,x),coord_list))
-
-    #count visible trees
-
-    #outer ring
-    outer_trees = (grid_df.index.size *2)+(grid_df.columns.size*2)-4 #corners are all double counted
-    inner_trees = sum(visible_tree_ls)
-    return outer_trees + inner_trees
+    return int(visibility_mask(load_grid(raw_data)).sum())
 
 def calculate_scenic_score(grid_df,curr_location):
     """
@@ -50,6 +79,7 @@ def calculate_scenic_score(grid_df,curr_location):
     :param curr_location: location to check
     :return: tree score of current location
     """
+    import pandas as pd #only needed here, kept out of the module imports so loading Day8 stays fast
     row_coord = curr_location[0]
     col_coord = curr_location[1]
 
@@ -72,17 +102,126 @@ def calculate_scenic_score(grid_df,curr_location):
             product*=closest_tree_index+1
     return product
 
+def viewing_distance_west(height_arr, dtype=np.int64):
+    """
+    counts the trees visible looking west from every position, stopping at the first tree at least as tall.
+    each row is scanned once, keeping the last column that reached each height (heights are small, 0-9)
+    :param height_arr: 2-D array of tree heights
+    :param dtype: int dtype of the returned distances, a distance is always less than the row length
+    :return: 2-D int array of viewing distances
+    """
+    num_rows, num_cols = height_arr.shape
+    num_heights = int(height_arr.max()) + 1 if height_arr.size else 1
+    height_levels = np.arange(num_heights)
+    #last column with a tree at least as tall as each height, 0 (the edge) if there isn't one
+    last_blocking_arr = np.zeros((num_rows, num_heights), dtype=np.int64)
+    row_indices = np.arange(num_rows)
+    distance_arr = np.zeros((num_rows, num_cols), dtype=dtype)
+    for col_coord in range(num_cols):
+        col_heights = height_arr[:, col_coord]
+        distance_arr[:, col_coord] = col_coord - last_blocking_arr[row_indices, col_heights]
+        last_blocking_arr[height_levels <= col_heights[:, None]] = col_coord
+    return distance_arr
+
+def scenic_score_grid(height_arr):
+    """
+    calculates the scenic score of every position from the viewing distances in all four directions
+    :param height_arr: 2-D array of tree heights
+    :return: 2-D int array of scenic scores
+    """
+    height_arr = np.asarray(height_arr, dtype=np.int64)
+    return (
+        viewing_distance_west(height_arr) *
+        viewing_distance_west(height_arr[:, ::-1])[:, ::-1] * #east
+        viewing_distance_west(height_arr.T).T * #north
+        viewing_distance_west(height_arr[::-1, :].T).T[::-1, :] #south
+    )
+
 def max_scenic_score(raw_data):
     """
     calculates scenic score from each position and returns the highest one
     :param raw_data: raw_input
     :return: highest scenic_score
     """
-    split_data = [y for y in raw_data.split("\n")]
-    grid_df = pd.DataFrame([[*x] for x in split_data]).applymap(lambda x: int(x))
-    coord_list = [(x,y) for x in range(1,grid_df.index.size-1) for y in range(1,grid_df.columns.size-1)] #it's caught in the code, but since all edge trees have one 0 view, don't bother to test them
-    scenic_score_ls = list(map(lambda x: calculate_scenic_score(grid_df,x),coord_list))
-    return max(scenic_score_ls)
+    return int(scenic_score_grid(load_grid(raw_data)).max())
+
+def map_grid(file_path):
+    """
+    memory-maps a grid file and views it as a 2-D uint8 array of the digit characters without reading it in.
+    the newline at the end of each row is skipped over by the row stride
+    :param file_path: path to the grid file
+    :return: read-only uint8 array of shape (rows, columns) backed by the mapped file
+    """
+    with open(file_path, "rb") as input_file:
+        mapped_file = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+    row_length = mapped_file.find(b"\n")
+    if row_length == -1: #single row with no newline
+        row_length = len(mapped_file)
+    num_rows = (len(mapped_file) + 1) // (row_length + 1) #last row may not end in a newline
+    return np.ndarray((num_rows, row_length), dtype=np.uint8, buffer=mapped_file, strides=(row_length + 1, 1))
+
+def scan_rows(height_arr):
+    """
+    does the west and east scans for every row
+    :param height_arr: 2-D array of tree heights
+    :return: boolean array of trees visible from west or east, west and east viewing distance arrays in the
+    narrowest unsigned dtype that holds the row length
+    """
+    distance_dtype = np.min_scalar_type(height_arr.shape[1])
+    visible_arr = visible_from_west(height_arr) | visible_from_west(height_arr[:, ::-1])[:, ::-1]
+    west_distance_arr = viewing_distance_west(height_arr, distance_dtype)
+    east_distance_arr = viewing_distance_west(height_arr[:, ::-1], distance_dtype)[:, ::-1]
+    return visible_arr, west_distance_arr, east_distance_arr
+
+def _scan_row_stripe(file_path, row_start, row_stop):
+    height_arr = map_grid(file_path)[row_start:row_stop] - ord("0")
+    return scan_rows(height_arr)
+
+def _scan_col_stripe(file_path, col_start, col_stop):
+    #columns are scanned as the rows of the transposed stripe
+    height_arr = map_grid(file_path)[:, col_start:col_stop].T - ord("0")
+    visible_arr, north_distance_arr, south_distance_arr = scan_rows(height_arr)
+    return visible_arr.T, north_distance_arr.T, south_distance_arr.T
+
+def _merge_stripe(visible_arr, score_arr, stripe_slice, stripe_result):
+    stripe_visible_arr, first_distance_arr, second_distance_arr = stripe_result
+    visible_arr[stripe_slice] |= stripe_visible_arr
+    #distances come back narrow and are only widened as they are multiplied into the score grid
+    score_arr[stripe_slice] *= first_distance_arr
+    score_arr[stripe_slice] *= second_distance_arr
+
+def tiled_forest_scan(file_path, stripe_size=1024, processes=None):
+    """
+    builds the visibility mask and scenic score grid of a memory-mapped forest in stripes, row stripes for the
+    west/east scans and column stripes for the north/south scans, spread over a process pool.
+    only a few stripes are in flight at once and each is merged and dropped as soon as it is done
+    :param file_path: path to the grid file
+    :param stripe_size: number of rows or columns handled by each task
+    :param processes: number of worker processes, None for one per core
+    :return: boolean visibility mask, int scenic score grid
+    """
+    num_rows, num_cols = map_grid(file_path).shape
+    visible_arr = np.zeros((num_rows, num_cols), dtype=bool)
+    score_arr = np.ones((num_rows, num_cols), dtype=np.int64)
+    stripe_ls = [
+        (_scan_row_stripe, row_start, min(row_start + stripe_size, num_rows), np.s_[row_start:row_start + stripe_size])
+        for row_start in range(0, num_rows, stripe_size)
+    ] + [
+        (_scan_col_stripe, col_start, min(col_start + stripe_size, num_cols), np.s_[:, col_start:col_start + stripe_size])
+        for col_start in range(0, num_cols, stripe_size)
+    ]
+    max_in_flight = 2 * (processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        future_queue = deque()
+        for scan_function, stripe_start, stripe_stop, stripe_slice in stripe_ls:
+            future_queue.append((stripe_slice, pool.submit(scan_function, file_path, stripe_start, stripe_stop)))
+            if len(future_queue) >= max_in_flight:
+                done_slice, done_future = future_queue.popleft()
+                _merge_stripe(visible_arr, score_arr, done_slice, done_future.result())
+        while future_queue:
+            done_slice, done_future = future_queue.popleft()
+            _merge_stripe(visible_arr, score_arr, done_slice, done_future.result())
+    return visible_arr, score_arr
 
 if __name__=="__main__":
     print(f"there are {num_visible(data)} trees visible from outside the grid")
@@ -133,6 +133,91 @@ class TestCalculateMonkeyBusiness(unittest.TestCase):
             Day11.calculate_monkey_business(raw_input, 10000),
         )
 
+    def test_calculate_monkey_business_cycles(self):
+        with open("Day11_test_input.txt") as input_file:
+            raw_input = input_file.read()
+        self.assertEqual(
+            [10197, 2713310158],
+            [
+                Day11.calculate_monkey_business(raw_input, 20, "cycles"),
+                Day11.calculate_monkey_business(raw_input, 10000, "cycles"),
+            ]
+        )
+
+    def test_calculate_monkey_business_numpy(self):
+        with open("Day11_test_input.txt") as input_file:
+            raw_input = input_file.read()
+        self.assertEqual(
+            [10197, 2713310158],
+            [
+                Day11.calculate_monkey_business(raw_input, 20, "numpy"),
+                Day11.calculate_monkey_business(raw_input, 10000, "numpy"),
+            ]
+        )
+
+    def test_calculate_monkey_business_parallel(self):
+        with open("Day11_test_input.txt") as input_file:
+            raw_input = input_file.read()
+        self.assertEqual(
+            2713310158,
+            Day11.calculate_monkey_business(raw_input, 10000, "parallel", processes=2),
+        )
+
+    def test_calculate_monkey_business_relief_divisor(self):
+        with open("Day11_test_input.txt") as input_file:
+            raw_input = input_file.read()
+        self.assertEqual(
+            [10605, 10605],
+            [
+                Day11.calculate_monkey_business(raw_input, 20, relief_divisor=3),
+                Day11.calculate_monkey_business(raw_input, 20, "numpy", relief_divisor=3),
+            ]
+        )
+
+    def test_calculate_monkey_business_relief_divisor_exact(self):
+        raw_input = (
+            "Monkey 0:\n  Starting items: 8, 62, 47, 73\n  Operation: new = old * 8\n  Test: divisible by 13\n"
+            "    If true: throw to monkey 2\n    If false: throw to monkey 1\n\n"
+            "Monkey 1:\n  Starting items: 45, 1, 69, 70\n  Operation: new = old * 16\n  Test: divisible by 5\n"
+            "    If true: throw to monkey 0\n    If false: throw to monkey 2\n\n"
+            "Monkey 2:\n  Starting items: 12, 71\n  Operation: new = old * 3\n  Test: divisible by 2\n"
+            "    If true: throw to monkey 0\n    If false: throw to monkey 1"
+        )
+        expected_ls = []
+        for relief_divisor in [3, 2]:
+            #worry levels are never reduced, so this is the exact answer
+            monkey_ls, test_product = Day11.parse_monkeys(raw_input)
+            item_count_ls = [0 for x in monkey_ls]
+            for round_num in range(15):
+                monkey_ls, item_count_ls = Day11.round_implementer(monkey_ls, item_count_ls, None, relief_divisor)
+            expected_ls.append(Day11.monkey_business(item_count_ls))
+        self.assertEqual(
+            expected_ls,
+            [
+                Day11.calculate_monkey_business(raw_input, 15, relief_divisor=3),
+                Day11.calculate_monkey_business(raw_input, 15, relief_divisor=2),
+            ]
+        )
+        self.assertEqual(17732, expected_ls[0])
+
+class TestRoundObserver(unittest.TestCase):
+    def test_round_observer(self):
+        with open("Day11_test_input.txt") as input_file:
+            raw_input = input_file.read()
+        observer = Day11.RoundObserver(sample_every=1000)
+        monkey_business = Day11.calculate_monkey_business(raw_input, 10000, observer=observer)
+        summary = observer.summary()
+        self.assertEqual(
+            [2713310158, 10, [0, 1000, 2000], [2, 4, 3, 6], {"operation", "test", "throw"}],
+            [
+                monkey_business,
+                summary["sampled_rounds"],
+                [x["round"] for x in observer.round_record_ls[:3]],
+                observer.round_record_ls[0]["inspections"],
+                set(summary["phase_share"]),
+            ]
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -99,5 +99,68 @@ class TestMinStepsPathFinderMultipleStart(unittest.TestCase):
             Day12.min_steps_path_finder_multiple_start(raw_data)
         )
 
+
+class TestLoadHeightMap(unittest.TestCase):
+    def test_load_height_map(self):
+        height_map = Day12.load_height_map("Day12_test_input.txt")
+        self.assertEqual(
+            [(5, 8), b'Sabqponm', b'abdefghi', b'E'],
+            [height_map.shape, height_map[0].tobytes(), height_map[-1].tobytes(), height_map[2, 5].tobytes()]
+        )
+
+
+class TestMappedPathFinder(unittest.TestCase):
+    def test_mapped_path_finder(self):
+        height_map = Day12.load_height_map("Day12_test_input.txt")
+        self.assertEqual(
+            [31, 29],
+            [Day12.mapped_path_finder(height_map), Day12.mapped_path_finder(height_map, b'Sa')]
+        )
+
+
+class TestWavefrontPathFinder(unittest.TestCase):
+    def test_wavefront_path_finder(self):
+        with open("Day12_test_input.txt") as input_file:
+            raw_data = input_file.read()
+        height_map = Day12.height_map_view(raw_data.encode())
+        self.assertEqual(
+            [31, 29],
+            [Day12.wavefront_path_finder(height_map), Day12.wavefront_path_finder(height_map, b'Sa')]
+        )
+
+
+class TestHeightMapRouter(unittest.TestCase):
+    def test_route_batch(self):
+        with open("Day12_test_input.txt") as input_file:
+            raw_data = input_file.read()
+        router = Day12.HeightMapRouter(Day12.height_map_view(raw_data.encode()), cache_size=1, processes=2)
+        self.assertEqual(
+            [
+                [31, 30, 0, 1],
+                [31, 6],
+                [(0, 1)],
+            ],
+            [
+                router.route_batch([((0, 0), (2, 5)), ((0, 1), (2, 5)), ((2, 5), (2, 5)), ((0, 0), (0, 1))]),
+                [router.route((0, 0), (2, 5)), router.route((2, 5), (0, 1))],
+                list(router.distance_fields),
+            ]
+        )
+        router.close()
+
+    def test_route_batch_reuses_pool(self):
+        with open("Day12_test_input.txt") as input_file:
+            raw_data = input_file.read()
+        with Day12.HeightMapRouter(Day12.height_map_view(raw_data.encode()), cache_size=1, processes=2) as router:
+            first_batch = router.route_batch([((0, 0), (2, 5)), ((0, 0), (0, 1))])
+            first_pool = router.pool
+            second_batch = router.route_batch([((0, 0), (2, 5)), ((0, 0), (0, 1))])
+            second_pool = router.pool
+        self.assertEqual(
+            [first_batch, second_batch, first_pool is not None, first_pool is second_pool, router.pool],
+            [[31, 1], [31, 1], True, True, None]
+        )
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -11,6 +11,17 @@ class TestOrderCount(unittest.TestCase):
             Day13.order_count(raw_data)
         )
 
+    def test_order_count_parallel(self):
+        with open("Day13_test_input.txt") as input_file:
+            raw_data = input_file.read()
+        self.assertEqual(
+            [13, 13],
+            [
+                Day13.parallel_order_count(raw_data.split('\n'), chunk_size=3, processes=2),
+                Day13.order_count_from_file("Day13_test_input.txt", chunk_size=3, processes=2),
+            ]
+        )
+
 class TestFindDecoderKey(unittest.TestCase):
     def test_decoder_key(self):
         with open("Day13_test_input.txt") as input_file:
@@ -20,5 +31,32 @@ class TestFindDecoderKey(unittest.TestCase):
             Day13.find_decoder_key(raw_data)
         )
 
+    def test_decoder_key_from_file(self):
+        self.assertEqual(
+            [140, 10 * 14 * 17],
+            [
+                Day13.decoder_key_from_file("Day13_test_input.txt"),
+                Day13.decoder_key_from_file("Day13_test_input.txt", [[[2]], [[6]], [[8]]]),
+            ]
+        )
+
+class TestPacketComparer(unittest.TestCase):
+    def test_packet_comparer(self):
+        with open("Day13_test_input.txt") as input_file:
+            raw_data = input_file.read()
+        comparer = Day13.PacketComparer(cache_size=50)
+        first_count = comparer.order_count(raw_data)
+        first_misses = comparer.cache_info()["misses"]
+        self.assertEqual(
+            [13, 13, first_misses, [[[[]]], [[4, 4], 4, 4], [7, 7, 7], [7, 7, 7, 7], [9]]],
+            [
+                first_count,
+                comparer.order_count(raw_data),
+                comparer.cache_info()["misses"],
+                comparer.sort_packets([[[4, 4], 4, 4], [7, 7, 7, 7], [9], [[[]]], [7, 7, 7]]),
+            ]
+        )
+        self.assertGreater(comparer.cache_info()["hits"], 0)
+
 if __name__ == '__main__':
     unittest.main()
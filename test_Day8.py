@@ -1,4 +1,6 @@
 import unittest
+import os
+import numpy as np
 import pandas as pd
 import Day8
 
@@ -24,6 +26,26 @@ class test_num_visible(unittest.TestCase):
             21
         )
 
+class test_load_grid(unittest.TestCase):
+    def test_load_grid_1(self):
+        with open("Day8_test_input.txt") as input_file:
+            raw_data = input_file.read()
+        self.assertEqual(
+            Day8.load_grid(raw_data).tolist(),
+            [[int(x) for x in y] for y in raw_data.split("\n")]
+        )
+
+class test_visibility_mask(unittest.TestCase):
+    def test_visibility_mask_1(self):
+        with open("Day8_test_input.txt") as input_file:
+            split_data = [y for y in input_file.read().split("\n")]
+
+        height_arr = np.array([[int(x) for x in y] for y in split_data])
+        self.assertEqual(
+            Day8.visibility_mask(height_arr)[1:-1, 1:-1].flatten().tolist(),
+            [True, True, False, True, False, True, False, True, False]
+        )
+
 class test_calculate_scenic_score(unittest.TestCase):
     def test_calculate_scenic_score_1(self):
         with open("Day8_test_input.txt") as input_file:
@@ -48,6 +70,19 @@ class test_calculate_scenic_score(unittest.TestCase):
                 0,
             ]
         )
+
+class test_scenic_score_grid(unittest.TestCase):
+    def test_scenic_score_grid_1(self):
+        with open("Day8_test_input.txt") as input_file:
+            split_data = [y for y in input_file.read().split("\n")]
+
+        height_arr = np.array([[int(x) for x in y] for y in split_data])
+        score_arr = Day8.scenic_score_grid(height_arr)
+        self.assertEqual(
+            [score_arr[1, 2], score_arr[3, 2], score_arr[0, 2], score_arr[1, 4], score_arr[4, 2], score_arr[1, 0]],
+            [4, 8, 0, 0, 0, 0]
+        )
+
 class test_max_scenic_score(unittest.TestCase):
     def test_max_scenic_score_1(self):
         with open("Day8_test_input.txt") as input_file:
@@ -56,5 +91,28 @@ class test_max_scenic_score(unittest.TestCase):
             Day8.max_scenic_score(raw_data),
             8
         )
+
+class test_tiled_forest_scan(unittest.TestCase):
+    def test_tiled_forest_scan_1(self):
+        with open("Day8_test_input.txt") as input_file:
+            height_arr = Day8.load_grid(input_file.read())
+        visible_arr, score_arr = Day8.tiled_forest_scan("Day8_test_input.txt", stripe_size=2, processes=2)
+        self.assertEqual(
+            [visible_arr.tolist(), score_arr.tolist(), int(visible_arr.sum()), int(score_arr.max())],
+            [Day8.visibility_mask(height_arr).tolist(), Day8.scenic_score_grid(height_arr).tolist(), 21, 8]
+        )
+
 if __name__ == '__main__':
     unittest.main()
+
+    def test_tiled_forest_scan_narrow_distances(self):
+        height_arr = np.random.default_rng(8).integers(0, 10, (40, 300))
+        with open("Day8_random_input.txt", "w") as output_file:
+            output_file.write("\n".join("".join(str(x) for x in y) for y in height_arr))
+        _, west_distance_arr, east_distance_arr = Day8.scan_rows(height_arr)
+        visible_arr, score_arr = Day8.tiled_forest_scan("Day8_random_input.txt", stripe_size=7, processes=2)
+        os.remove("Day8_random_input.txt")
+        self.assertEqual(
+            [west_distance_arr.dtype, east_distance_arr.dtype, visible_arr.tolist(), score_arr.tolist()],
+            [np.uint16, np.uint16, Day8.visibility_mask(height_arr).tolist(), Day8.scenic_score_grid(height_arr).tolist()]
+        )